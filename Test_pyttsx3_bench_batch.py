@@ -0,0 +1,52 @@
+"""
+批次處理基準測試：逐段 apply_effects + normalize() 對比 apply_effects_batch。
+
+以測試語音檔切出多段短提示（0.2-1 秒），比較每秒可處理的提示數，
+並列出批次結果與逐段結果的相對誤差。
+"""
+from pydub import AudioSegment
+import numpy as np
+import random
+import time
+import os
+
+from Test_pyttsx3_v08 import apply_effects, apply_effects_batch, trim_silence
+
+def short_prompts(sample, count, min_ms=200, max_ms=1000):
+    """從測試語音隨機切出多段短提示。"""
+    prompts = []
+    for _ in range(count):
+        length = random.randint(min_ms, min(max_ms, len(sample)))
+        start = random.randint(0, len(sample) - length)
+        prompts.append(sample[start:start + length])
+    return prompts
+
+def relative_error(reference, candidate):
+    """兩段音訊的 RMS 差異相對於參考訊號 RMS。"""
+    x = np.array(reference.get_array_of_samples(), dtype=np.float64)
+    y = np.array(candidate.get_array_of_samples(), dtype=np.float64)
+    n = min(len(x), len(y))
+    return np.sqrt(np.mean((x[:n] - y[:n]) ** 2)) / max(np.sqrt(np.mean(x ** 2)), 1e-9)
+
+def best_of(func, repeat=3):
+    """返回 (結果, 最短耗時秒數)。"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+if __name__ == "__main__":
+    random.seed(0)
+    sample = trim_silence(AudioSegment.from_wav(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "你好，這是測試語音。")))
+
+    print(f"{'提示數':>6} | {'逐段 提示/秒':>12} | {'批次 提示/秒':>12} | {'加速':>6} | {'最大相對誤差':>10}")
+    for count in (8, 32, 128):
+        prompts = short_prompts(sample, count)
+        serial, t_serial = best_of(lambda: [apply_effects(p).normalize() for p in prompts])
+        batched, t_batch = best_of(lambda: apply_effects_batch(prompts, normalize=True))
+        error = max(relative_error(r, b) for r, b in zip(serial, batched))
+        print(f"{count:>6} | {count / t_serial:12.1f} | {count / t_batch:12.1f} | "
+              f"x{t_serial / t_batch:5.1f} | {error:10.4f}")
@@ -0,0 +1,70 @@
+"""
+語速調整基準測試：WSOLA time_stretch 對比 pydub.effects.speedup。
+
+速度：處理 1 秒音訊所需的毫秒數。
+品質：
+    時長誤差  輸出長度與 原長/倍數 的差距。
+    SNR       以 220 Hz 正弦波加諧波為輸入，輸出與最佳擬合（同頻率）訊號的訊噪比，
+              拼接不連續或相位跳動都會拉低數值。
+speedup 只能加速，減速一欄標示為 "-"。
+"""
+from pydub import AudioSegment
+from pydub.effects import speedup
+import numpy as np
+import time
+import os
+
+from Test_pyttsx3_v08 import time_stretch
+
+FRAME_RATE = 22050
+F0 = 220.0
+SPEEDS = (0.5, 0.8, 0.95, 1.05, 1.25, 1.5, 2.0)
+
+def harmonic_tone(seconds=3.0, frame_rate=FRAME_RATE):
+    """產生 220 Hz 加兩個諧波的測試音。"""
+    t = np.arange(int(seconds * frame_rate)) / frame_rate
+    signal = sum(np.sin(2 * np.pi * F0 * h * t) / h for h in (1, 2, 3))
+    samples = (signal / np.abs(signal).max() * 12000).astype(np.int16)
+    return AudioSegment(samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=1)
+
+def tone_snr(audio_segment, edge=2000):
+    """以最小平方法擬合各諧波，返回擬合訊號與殘差的能量比（dB）。"""
+    y = np.array(audio_segment.get_array_of_samples(), dtype=np.float64)[edge:-edge]
+    t = np.arange(len(y)) / audio_segment.frame_rate
+    basis = np.stack([f(2 * np.pi * F0 * h * t) for h in (1, 2, 3) for f in (np.sin, np.cos)], axis=1)
+    coef = np.linalg.lstsq(basis, y, rcond=None)[0]
+    fitted = basis @ coef
+    return 10 * np.log10(np.sum(fitted ** 2) / np.sum((y - fitted) ** 2))
+
+def timed(func, audio_segment, speed, repeat=3):
+    """返回 (輸出, 每秒音訊的處理毫秒數)。"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func(audio_segment, speed)
+        best = min(best, time.perf_counter() - start)
+    return out, best * 1000 / (len(audio_segment) / 1000)
+
+def run(audio_segment, with_snr):
+    print(f"{'倍數':>6} | {'WSOLA ms/s':>10} {'時長誤差':>8} {'SNR':>7} | {'speedup ms/s':>12} {'時長誤差':>8} {'SNR':>7}")
+    for speed in SPEEDS:
+        expected = len(audio_segment) / speed
+        row = [f"{speed:>6.2f}"]
+        out, cost = timed(time_stretch, audio_segment, speed)
+        snr = f"{tone_snr(out):6.1f}dB" if with_snr else "-"
+        row.append(f"{cost:10.1f} {len(out) - expected:+7.0f}ms {snr:>7}")
+        if speed > 1.0:
+            out, cost = timed(speedup, audio_segment, speed)
+            snr = f"{tone_snr(out):6.1f}dB" if with_snr else "-"
+            row.append(f"{cost:12.1f} {len(out) - expected:+7.0f}ms {snr:>7}")
+        else:
+            row.append(f"{'-':>12} {'-':>8} {'-':>7}")
+        print(" | ".join(row))
+
+if __name__ == "__main__":
+    print("== 諧波測試音 ==")
+    run(harmonic_tone(), with_snr=True)
+
+    print("\n== 測試語音檔 ==")
+    sample = AudioSegment.from_wav(os.path.join(os.path.dirname(os.path.abspath(__file__)), "你好，這是測試語音。"))
+    run(sample, with_snr=False)
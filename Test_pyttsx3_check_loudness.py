@@ -0,0 +1,63 @@
+"""
+LoudnessNormalizer 峰值上限檢查：輸出的任何樣本都不得超過 ceiling_dbfs。
+
+情境：
+    區塊尾端的短暫突波後接低音量雜訊（區塊間內插會把下一區塊的大增益帶到突波上）、
+    同一個正規化器先處理安靜片段再處理語音、測試語音本身，
+    以及 finish_take 在正規化後套用結尾上揚增益。
+"""
+from pydub import AudioSegment
+import numpy as np
+import os
+
+from Test_pyttsx3_v08 import LoudnessNormalizer, finish_take, trim_silence
+
+FRAME_RATE = 22050
+
+def segment(samples):
+    """把 float 樣本轉成 16-bit 單聲道 AudioSegment。"""
+    pcm = np.clip(np.round(samples), -2**15, 2**15 - 1).astype(np.int16)
+    return AudioSegment(pcm.tobytes(), frame_rate=FRAME_RATE, sample_width=2, channels=1)
+
+def peak(audio_segment):
+    """最大樣本的絕對值。"""
+    return int(np.abs(np.array(audio_segment.get_array_of_samples(), dtype=np.int32)).max())
+
+def dbfs(value):
+    return 20 * np.log10(max(value, 1) / 2**15)
+
+def burst_at_block_end(rng):
+    """低音量雜訊中，某個 50 ms 區塊最後 20 個樣本為 20000 的突波。"""
+    block = FRAME_RATE * 50 // 1000
+    x = rng.standard_normal(FRAME_RATE * 2) * 300
+    end = 20 * block
+    x[end - 20:end] = 20000
+    return [segment(x)]
+
+def test_speech(rng):
+    """專案內的測試語音。"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "你好，這是測試語音。")
+    return [trim_silence(AudioSegment.from_wav(path))]
+
+def quiet_then_speech(rng):
+    """先送安靜片段累積出大增益，再送測試語音。"""
+    return [segment(rng.standard_normal(FRAME_RATE) * 300)] + test_speech(rng)
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    failed = False
+    for name, make in (('區塊尾端突波', burst_at_block_end), ('安靜後語音', quiet_then_speech), ('測試語音', test_speech)):
+        normalizer = LoudnessNormalizer()
+        # 輸出四捨五入成整數，上限也以樣本值比較
+        ceiling = int(round(normalizer.ceiling * 2**15))
+        chunks = make(rng)
+        normalized = max(peak(normalizer.process(chunk)) for chunk in chunks)
+        # 結尾句的最大語氣增益（強調 x 隨機 x 上揚）
+        normalizer.reset()
+        finished = max(peak(finish_take(chunk, normalizer, gain=1.003 * 1.003 * 1.05)) for chunk in chunks)
+        ok = normalized <= ceiling and finished < 2**15 - 1
+        failed |= not ok
+        print(f"{name:<8} 正規化峰值 {dbfs(normalized):7.3f} dBFS（上限 {dbfs(ceiling):.2f}），"
+              f"加上語氣增益後 {dbfs(finished):7.3f} dBFS {'OK' if ok else '超過上限'}")
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,166 @@
+"""
+多行程音色處理池：以 multiprocessing.shared_memory 交付 PCM，
+只 pickle 共享記憶體的名稱與長度，音訊本身不經過 pickle。
+
+用法：
+    with DspPool(processes=4) as pool:
+        natural_tts("你好，歡迎光臨。", effects=pool.process)
+
+直接執行本檔會跑吞吐量基準測試（utterances/sec 對應行程數）。
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pydub import AudioSegment
+import threading
+import time
+import os
+
+from Test_pyttsx3_v08 import apply_effects, reverb_impulse
+
+# 子行程內的處理鏈參數，由 _init_worker 設定
+_CHAIN = {}
+
+def _init_worker(semitones, cutoff, decay, frame_rate):
+    """子行程初始化：記住處理鏈參數並預先暖機（建立脈衝響應快取、跑一次短音訊）。"""
+    _CHAIN.update(semitones=semitones, cutoff=cutoff, decay=decay)
+    reverb_impulse(frame_rate, decay)
+    warmup = AudioSegment(bytes(frame_rate // 10 * 2), frame_rate=frame_rate, sample_width=2, channels=1)
+    apply_effects(warmup, **_CHAIN)
+
+def _process_shared(name, n_bytes, frame_rate, sample_width, channels):
+    """
+    在子行程中處理共享記憶體內的 PCM，結果寫回同一塊記憶體。
+
+    返回：
+        int: 輸出 PCM 的位元組數；超出容量時返回 -1（由主行程改走本地處理）。
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        audio = AudioSegment(bytes(shm.buf[:n_bytes]), frame_rate=frame_rate,
+                             sample_width=sample_width, channels=channels)
+        out = apply_effects(audio, **_CHAIN).raw_data
+        if len(out) > shm.size:
+            return -1
+        shm.buf[:len(out)] = out
+        return len(out)
+    finally:
+        shm.close()
+
+class DspPool:
+    """
+    音色處理子行程池，process() 可由多個執行緒同時呼叫。
+
+    scipy 卷積與 pydub 濾波在單一行程中會互搶 GIL，交給子行程可在多核心機器上並行處理；
+    單核心時只多了行程間交付的開銷，反而比同行程多執行緒慢。
+    """
+
+    def __init__(self, processes=None, semitones=0.3, cutoff=4500, decay=0.2, frame_rate=22050):
+        """
+        參數：
+            processes (int): 子行程數（默認 CPU 核心數）。
+            semitones (float): 音高調整半音數。
+            cutoff (int): 低通濾波截止頻率。
+            decay (float): 混響衰減係數。
+            frame_rate (int): 預先暖機的採樣率。
+        """
+        self.semitones = semitones
+        self.cutoff = cutoff
+        self.decay = decay
+        self.processes = processes or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            initializer=_init_worker,
+            initargs=(semitones, cutoff, decay, frame_rate),
+        )
+
+    def process(self, audio_segment):
+        """
+        把音訊交給子行程處理，介面與 apply_effects 相同。
+
+        參數：
+            audio_segment (AudioSegment): 音訊對象。
+
+        返回：
+            AudioSegment: 處理後的音訊。
+        """
+        raw = audio_segment.raw_data
+        if not raw:
+            return audio_segment
+        # 降音高會拉長音訊，預留足夠容量
+        ratio = max(1.0, 2 ** (-self.semitones / 12.0))
+        capacity = int(len(raw) * ratio) + 1024 * audio_segment.frame_width
+        shm = shared_memory.SharedMemory(create=True, size=capacity)
+        try:
+            shm.buf[:len(raw)] = raw
+            future = self._executor.submit(
+                _process_shared, shm.name, len(raw),
+                audio_segment.frame_rate, audio_segment.sample_width, audio_segment.channels,
+            )
+            n_out = future.result()
+            if n_out < 0:
+                return apply_effects(audio_segment, self.semitones, self.cutoff, self.decay)
+            return audio_segment._spawn(bytes(shm.buf[:n_out]))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        """關閉子行程池。"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def benchmark(audio_segment, utterances=64, threads=8, process_counts=None):
+    """
+    比較單一行程多執行緒與子行程池的吞吐量。
+
+    參數：
+        audio_segment (AudioSegment): 測試用音訊。
+        utterances (int): 每組測試處理的句數。
+        threads (int): 同時呼叫的執行緒數（模擬 MQTT 服務）。
+        process_counts (list): 要測試的子行程數。
+
+    返回：
+        dict: {行程數: utterances/sec}，0 代表不使用子行程池。
+    """
+    if process_counts is None:
+        cores = os.cpu_count() or 1
+        process_counts = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+
+    def run(effects):
+        remaining = [utterances]
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                effects(audio_segment)
+
+        pool_threads = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for t in pool_threads:
+            t.start()
+        for t in pool_threads:
+            t.join()
+        return utterances / (time.perf_counter() - start)
+
+    results = {0: run(apply_effects)}
+    print(f"單一行程 ({threads} 執行緒): {results[0]:.2f} utterances/sec")
+    for n in process_counts:
+        with DspPool(processes=n, frame_rate=audio_segment.frame_rate) as pool:
+            results[n] = run(pool.process)
+        print(f"子行程池 {n} 個: {results[n]:.2f} utterances/sec "
+              f"(x{results[n] / results[0]:.2f}, 每行程效率 {results[n] / results[0] / n:.0%})")
+    return results
+
+if __name__ == "__main__":
+    # 使用專案內的測試語音檔
+    sample = AudioSegment.from_wav(os.path.join(os.path.dirname(os.path.abspath(__file__)), "你好，這是測試語音。"))
+    benchmark(sample)
@@ -0,0 +1,208 @@
+"""
+長文件輸出到檔案：逐句合成、處理，以固定大小的區塊寫入編碼器，
+記憶體用量只與單句長度有關，與文件總長無關。
+
+支援輸出格式：
+    .wav          直接寫 PCM，結束時回填 WAV 標頭長度。
+    .flac/.opus   以 ffmpeg 子行程邊收 PCM 邊編碼。
+
+用法：
+    python Test_pyttsx3_export.py 文件.txt 輸出.flac
+"""
+from pydub.utils import which
+from functools import partial
+import subprocess
+import random
+import wave
+import sys
+import os
+
+from Test_pyttsx3_v08 import (
+    LoudnessNormalizer, PAUSE_RANGE_MS, apply_effects, check_ffmpeg, init_engine,
+    make_pause, process_sentence, sentence_prosody, split_sentences, synthesize_sentence,
+    synthesize_with_retry,
+)
+
+# 每次寫入編碼器的影格數
+CHUNK_FRAMES = 16384
+# 沒有句末標點時，累積超過此字數就在逗號處斷句，避免單句過長
+MAX_SENTENCE_CHARS = 200
+
+# 副檔名對應的 ffmpeg 編碼器
+FFMPEG_CODECS = {
+    '.flac': ['-c:a', 'flac'],
+    '.opus': ['-c:a', 'libopus', '-b:a', '32k'],
+    '.ogg': ['-c:a', 'libopus', '-b:a', '32k'],
+}
+
+class WavChunkWriter:
+    """逐區塊寫入 PCM 的 WAV 檔案，關閉時回填標頭中的長度欄位。"""
+
+    def __init__(self, path, frame_rate, channels=1, sample_width=2):
+        self._wav = wave.open(path, 'wb')
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(sample_width)
+        self._wav.setframerate(frame_rate)
+
+    def write(self, pcm):
+        # writeframesraw 不會每次都回頭改標頭，長度在 close() 時一次回填
+        self._wav.writeframesraw(pcm)
+
+    def close(self):
+        self._wav.close()
+
+class FfmpegChunkWriter:
+    """把 PCM 逐區塊送進 ffmpeg 子行程，編碼成 FLAC 或 Opus。"""
+
+    def __init__(self, path, frame_rate, channels=1, sample_width=2):
+        check_ffmpeg()
+        ext = os.path.splitext(path)[1].lower()
+        pcm_format = {1: 's8', 2: 's16le', 4: 's32le'}[sample_width]
+        self._proc = subprocess.Popen(
+            [which('ffmpeg'), '-y', '-loglevel', 'error',
+             '-f', pcm_format, '-ar', str(frame_rate), '-ac', str(channels), '-i', 'pipe:0',
+             *FFMPEG_CODECS[ext], path],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, pcm):
+        self._proc.stdin.write(pcm)
+
+    def close(self):
+        self._proc.stdin.close()
+        if self._proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg 編碼失敗，結束碼 {self._proc.returncode}")
+
+def open_writer(path, frame_rate, channels=1, sample_width=2):
+    """
+    依副檔名選擇輸出方式。
+
+    參數：
+        path (str): 輸出路徑（.wav / .flac / .opus / .ogg）。
+        frame_rate (int): 採樣率。
+        channels (int): 聲道數。
+        sample_width (int): 每個樣本的位元組數。
+
+    返回：
+        WavChunkWriter 或 FfmpegChunkWriter。
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.wav':
+        return WavChunkWriter(path, frame_rate, channels, sample_width)
+    if ext in FFMPEG_CODECS:
+        return FfmpegChunkWriter(path, frame_rate, channels, sample_width)
+    raise ValueError(f"不支援的輸出格式: {ext}")
+
+def iter_sentences(lines, max_chars=MAX_SENTENCE_CHARS):
+    """
+    從逐行讀入的文件中依序產生句子，不需把整份文件讀進記憶體。
+
+    句子可跨行；空行與縮排開頭的行（段落）視為句子邊界，沒有標點的標題不會併入下一句。
+
+    參數：
+        lines (iterable): 文字行（例如開啟的檔案）。
+        max_chars (int): 單句最大字數，超過時在逗號處斷開。
+
+    產生：
+        str: 句子。
+    """
+    pending = ''
+    for line in lines:
+        # 空行或縮排開頭代表新段落，先送出上一段未結束的句子
+        if pending and (not line.strip() or line[:1] in ' \t\u3000'):
+            yield pending
+            pending = ''
+        pending += line.strip()
+        parts = split_sentences(pending)
+        # 最後一段若不是以句末標點結尾，留到下一行再判斷
+        if parts and parts[-1][-1] not in '。！？':
+            pending = parts.pop()
+        else:
+            pending = ''
+        for part in parts:
+            yield part
+        while len(pending) > max_chars:
+            cut = pending.rfind('，', 0, max_chars)
+            cut = max_chars if cut < 0 else cut + 1
+            yield pending[:cut]
+            pending = pending[cut:]
+    if pending:
+        yield pending
+
+def write_chunked(writer, audio_segment, chunk_frames=CHUNK_FRAMES):
+    """以固定影格數分段寫出音訊。"""
+    raw = audio_segment.raw_data
+    step = chunk_frames * audio_segment.frame_width
+    for offset in range(0, len(raw), step):
+        writer.write(raw[offset:offset + step])
+
+def render_to_file(lines, output_path, base_rate=95, base_volume=0.8,
+                   chunk_frames=CHUNK_FRAMES, effects=apply_effects, synthesize=None):
+    """
+    把長文件合成為單一音訊檔，邊合成邊寫入。
+
+    參數：
+        lines (iterable): 文字行，或單一字串。
+        output_path (str): 輸出路徑，格式依副檔名決定。
+        base_rate (int): 基礎語速（默認 95）。
+        base_volume (float): 基礎音量（默認 0.8）。
+        chunk_frames (int): 每次寫入的影格數。
+        effects (callable): 音色處理鏈（默認 apply_effects）。
+        synthesize (callable): 合成函式，默認使用本行程的 pyttsx3 引擎。
+
+    返回：
+        int: 寫出的總影格數。
+
+    例外：
+        RuntimeError: 沒有任何句子合成成功（不會留下輸出檔）。
+    """
+    if isinstance(lines, str):
+        lines = [lines]
+    if synthesize is None:
+        synthesize = partial(synthesize_sentence, init_engine())
+    normalizer = LoudnessNormalizer()
+    writer = None
+    total_frames = 0
+
+    # 預讀一句，才能判斷目前是否為最後一句
+    sentences = iter_sentences(lines)
+    current = next(sentences, None)
+    index = 0
+    try:
+        while current is not None:
+            following = next(sentences, None)
+            speed, gain = sentence_prosody(current, index == 0, following is None)
+            try:
+                raw = synthesize_with_retry(synthesize, current, int(base_rate * speed), base_volume)
+                audio = process_sentence(raw, normalizer, gain, effects)
+            except Exception as e:
+                print(f"An unexpected error occurred: {e}")
+                current = following
+                index += 1
+                continue
+
+            if writer is None:
+                writer = open_writer(output_path, audio.frame_rate, audio.channels, audio.sample_width)
+            write_chunked(writer, audio, chunk_frames)
+            total_frames += int(audio.frame_count())
+            if following is not None:
+                pause = make_pause(audio, random.uniform(*PAUSE_RANGE_MS))
+                write_chunked(writer, pause, chunk_frames)
+                total_frames += int(pause.frame_count())
+
+            current = following
+            index += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise RuntimeError(f"沒有任何句子合成成功，未輸出 {output_path}")
+    return total_frames
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("用法: python Test_pyttsx3_export.py 文件.txt 輸出.wav|.flac|.opus")
+        sys.exit(1)
+    with open(sys.argv[1], encoding='utf-8') as document:
+        frames = render_to_file(document, sys.argv[2])
+    print(f"已輸出 {frames} 影格到 {sys.argv[2]}")
@@ -0,0 +1,298 @@
+"""
+遞迴濾波與限幅器核心：有安裝 Numba 時以 JIT 編譯（僅 CPU），否則使用 NumPy/scipy 實作。
+
+    低通濾波   與 pydub low_pass_filter 相同的一階 IIR。
+    混響       與 apply_reverb 相同的截斷指數衰減，改寫成一階遞迴，O(N) 而非卷積。
+    限幅器     前瞻式峰值限幅，取代 normalize()：增益包絡由兩次最小值掃描得到
+               （往後為線性釋放、往前為線性起音），任何樣本都不會超過上限。
+
+Numba 編譯結果以 cache=True 快取在 __pycache__，之後啟動不必重新編譯。
+直接執行本檔會列出各後端每個樣本的處理成本。
+
+用法：
+    from Test_pyttsx3_kernels import LimiterNormalizer, apply_effects
+    natural_tts("你好。", effects=apply_effects, normalizer=LimiterNormalizer())
+"""
+from scipy.signal import lfilter
+from pydub import AudioSegment
+import numpy as np
+import time
+
+from Test_pyttsx3_v08 import (
+    adjust_pitch, apply_effects as reference_effects, limiter_gain as numpy_limiter_gain, time_stretch,
+)
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# 預設後端
+BACKEND = 'numba' if HAVE_NUMBA else 'numpy'
+
+def resolve_backend(backend=None):
+    """
+    決定實際使用的後端：None 為 BACKEND，未安裝 Numba 時 'numba' 改用 'numpy'。
+
+    例外：
+        ValueError: 不認得的後端名稱。
+    """
+    backend = backend or BACKEND
+    if backend not in ('numba', 'numpy'):
+        raise ValueError(f"未知的後端: {backend}（可用 'numba' 或 'numpy'）")
+    return backend if HAVE_NUMBA else 'numpy'
+
+def _jit(func):
+    """有 Numba 時編譯並快取到磁碟，否則返回 None。"""
+    return njit(cache=True, nogil=True)(func) if HAVE_NUMBA else None
+
+def _lowpass_loop(x, alpha):
+    y = np.empty_like(x)
+    if len(x) == 0:
+        return y
+    last = x[0]
+    y[0] = last
+    for i in range(1, len(x)):
+        last += alpha * (x[i] - last)
+        y[i] = last
+    return y
+
+def _reverb_loop(x, decay, taps):
+    y = np.empty_like(x)
+    tail = decay ** taps
+    acc = 0.0
+    for i in range(len(x)):
+        acc = x[i] + decay * acc
+        if i >= taps:
+            acc -= tail * x[i - taps]
+        y[i] = acc
+    return y
+
+def _limiter_gain_loop(x, ceiling, attack_step, release_step):
+    n = len(x)
+    gain = np.empty(n)
+    # 往後掃描：增益最多每個樣本回升 release_step
+    level = 1.0
+    for i in range(n):
+        peak = abs(x[i])
+        need = ceiling / peak if peak > ceiling else 1.0
+        level = min(need, level + release_step)
+        gain[i] = level
+    # 往前掃描：在峰值之前以 attack_step 線性降下
+    level = 1.0
+    for i in range(n - 1, -1, -1):
+        level = min(gain[i], level + attack_step)
+        gain[i] = level
+    return gain
+
+_lowpass_jit = _jit(_lowpass_loop)
+_reverb_jit = _jit(_reverb_loop)
+_limiter_gain_jit = _jit(_limiter_gain_loop)
+
+def lowpass(x, alpha, backend=None):
+    """
+    一階低通濾波，y[0] = x[0]，y[n] = y[n-1] + alpha * (x[n] - y[n-1])。
+
+    參數：
+        x (numpy.ndarray): float64 樣本。
+        alpha (float): 平滑係數。
+        backend (str): 'numba' 或 'numpy'，默認 BACKEND；未安裝 Numba 時一律使用 'numpy'。
+
+    返回：
+        numpy.ndarray: 濾波結果。
+    """
+    if resolve_backend(backend) == 'numba':
+        return _lowpass_jit(x, alpha)
+    if len(x) == 0:
+        return x.copy()
+    y, _ = lfilter([alpha], [1, alpha - 1], x, zi=[(1 - alpha) * x[0]])
+    return y
+
+def reverb(x, decay, taps, backend=None):
+    """
+    截斷在 taps 個樣本的指數衰減混響，結果等同與 decay**k 脈衝響應卷積。
+
+    參數：
+        x (numpy.ndarray): float64 樣本。
+        decay (float): 每個樣本的衰減係數。
+        taps (int): 脈衝響應長度。
+        backend (str): 'numba' 或 'numpy'，默認 BACKEND；未安裝 Numba 時一律使用 'numpy'。
+
+    返回：
+        numpy.ndarray: 加入混響的結果。
+    """
+    if resolve_backend(backend) == 'numba':
+        return _reverb_jit(x, decay, taps)
+    # 無限長指數衰減減去延遲 taps 後的部分，即為截斷版本
+    y = lfilter([1.0], [1.0, -decay], x)
+    if taps < len(y):
+        y[taps:] -= decay ** taps * y[:-taps].copy()
+    return y
+
+def limiter_gain(x, ceiling, attack_step, release_step, backend=None):
+    """
+    前瞻限幅器的增益包絡。
+
+    參數：
+        x (numpy.ndarray): float64 樣本。
+        ceiling (float): 峰值上限（與 x 同刻度）。
+        attack_step (float): 峰值之前每個樣本最多下降的增益。
+        release_step (float): 峰值之後每個樣本最多回升的增益。
+        backend (str): 'numba' 或 'numpy'，默認 BACKEND；未安裝 Numba 時一律使用 'numpy'。
+
+    返回：
+        numpy.ndarray: 每個樣本的增益（0-1）。
+    """
+    if resolve_backend(backend) == 'numba':
+        return _limiter_gain_jit(x, ceiling, attack_step, release_step)
+    return numpy_limiter_gain(x, ceiling, attack_step, release_step)
+
+def _samples(audio_segment):
+    return np.array(audio_segment.get_array_of_samples(), dtype=np.float64)
+
+def _spawn(audio_segment, samples):
+    full_scale = float(1 << (8 * audio_segment.sample_width - 1))
+    samples = np.clip(np.round(samples), -full_scale, full_scale - 1)
+    samples = samples.astype({1: np.int8, 2: np.int16, 4: np.int32}[audio_segment.sample_width])
+    return audio_segment._spawn(samples.tobytes())
+
+def _per_channel(func, audio_segment, *args):
+    """多聲道音訊逐聲道處理後再合併，避免把交錯樣本當成單一訊號濾波。"""
+    return AudioSegment.from_mono_audiosegments(*(func(channel, *args) for channel in audio_segment.split_to_mono()))
+
+def low_pass_filter(audio_segment, cutoff, backend=None):
+    """與 AudioSegment.low_pass_filter 相同，改用核心實作；多聲道時逐聲道處理。"""
+    if audio_segment.channels != 1:
+        return _per_channel(low_pass_filter, audio_segment, cutoff, backend)
+    rc = 1.0 / (cutoff * 2 * np.pi)
+    dt = 1.0 / audio_segment.frame_rate
+    return _spawn(audio_segment, lowpass(_samples(audio_segment), dt / (rc + dt), backend))
+
+def apply_reverb(audio_segment, decay=0.2, backend=None):
+    """與 Test_pyttsx3_v08.apply_reverb 相同，改用 O(N) 遞迴；多聲道時逐聲道處理。"""
+    if audio_segment.channels != 1:
+        return _per_channel(apply_reverb, audio_segment, decay, backend)
+    taps = int(audio_segment.frame_rate * 0.2)
+    return _spawn(audio_segment, reverb(_samples(audio_segment), decay, taps, backend))
+
+def limit(audio_segment, gain_db=0.0, ceiling_dbfs=-1.0, lookahead_ms=5, release_ms=80, backend=None):
+    """
+    套用增益後以前瞻限幅器壓住峰值。
+
+    參數：
+        audio_segment (AudioSegment): 音訊對象。
+        gain_db (float): 限幅前的增益（dB）。
+        ceiling_dbfs (float): 峰值上限（dBFS）。
+        lookahead_ms (float): 起音時間（毫秒），增益在峰值前這段時間內降下。
+        release_ms (float): 增益從 0 回升到 1 所需時間（毫秒）。
+        backend (str): 'numba' 或 'numpy'，默認 BACKEND；未安裝 Numba 時一律使用 'numpy'。
+
+    返回：
+        AudioSegment: 限幅後的音訊。
+    """
+    full_scale = float(1 << (8 * audio_segment.sample_width - 1))
+    x = _samples(audio_segment) * 10 ** (gain_db / 20.0)
+    attack_step = 1.0 / max(1.0, audio_segment.frame_rate * lookahead_ms / 1000)
+    release_step = 1.0 / max(1.0, audio_segment.frame_rate * release_ms / 1000)
+    ceiling = full_scale * 10 ** (ceiling_dbfs / 20.0)
+    return _spawn(audio_segment, x * limiter_gain(x, ceiling, attack_step, release_step, backend))
+
+class LimiterNormalizer:
+    """
+    以 RMS 增益加限幅器取代 normalize()，可傳給 finish_take / natural_tts 的 normalizer。
+
+    與峰值正規化不同，單一尖峰不會把整句音量壓低。
+    """
+
+    def __init__(self, target_dbfs=-20.0, ceiling_dbfs=-1.0, backend=None):
+        self.target_dbfs = target_dbfs
+        self.ceiling_dbfs = ceiling_dbfs
+        # 在建構時檢查後端名稱；finish_take 會吞掉處理中的例外，錯誤要在這裡就浮現
+        self.backend = resolve_backend(backend)
+
+    def process(self, audio_segment):
+        if audio_segment.rms == 0:
+            return audio_segment
+        gain_db = self.target_dbfs - audio_segment.dBFS
+        return limit(audio_segment, gain_db, self.ceiling_dbfs, backend=self.backend)
+
+def apply_effects(audio_segment, semitones=0.3, cutoff=4500, decay=0.2, speed=1.0, backend=None):
+    """
+    與 Test_pyttsx3_v08.apply_effects 相同的處理鏈（單聲道），低通與混響改用核心實作。
+
+    參數：
+        audio_segment (AudioSegment): 音訊對象。
+        semitones (float): 音高調整半音數（默認 +0.3）。
+        cutoff (int): 低通濾波截止頻率（默認 4500 Hz）。
+        decay (float): 混響衰減係數（默認 0.2）。
+        speed (float): 語速倍數（默認 1.0，不調整）。
+        backend (str): 'numba' 或 'numpy'，默認 BACKEND；未安裝 Numba 時一律使用 'numpy'。
+
+    返回：
+        AudioSegment: 處理後的音訊。
+    """
+    if audio_segment.channels != 1:
+        return reference_effects(audio_segment, semitones, cutoff, decay, speed)
+    audio = time_stretch(audio_segment, speed)
+    audio = adjust_pitch(audio, semitones)
+    rc = 1.0 / (cutoff * 2 * np.pi)
+    dt = 1.0 / audio.frame_rate
+    x = lowpass(_samples(audio), dt / (rc + dt), backend)
+    # pydub 的低通濾波每個樣本都截成整數，這裡保持一致
+    x = np.trunc(x)
+    x = reverb(x, decay, int(audio.frame_rate * 0.2), backend)
+    return _spawn(audio, x)
+
+def benchmark(seconds=10.0, frame_rate=22050, repeat=5):
+    """
+    列出各核心在每個後端下每個樣本的處理成本（奈秒）。
+
+    參數：
+        seconds (float): 測試訊號長度（秒）。
+        frame_rate (int): 採樣率。
+        repeat (int): 重複次數，取最短耗時。
+    """
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal(int(seconds * frame_rate)) * 8000
+    alpha = 0.5
+    taps = int(frame_rate * 0.2)
+    kernels = {
+        '低通濾波': lambda b: lowpass(x, alpha, b),
+        '混響': lambda b: reverb(x, 0.2, taps, b),
+        '限幅器': lambda b: limiter_gain(x, 20000.0, 1 / 110, 1 / 1764, b),
+    }
+    backends = ['numpy'] + (['numba'] if HAVE_NUMBA else [])
+
+    if HAVE_NUMBA:
+        start = time.perf_counter()
+        for run in kernels.values():
+            run('numba')
+        print(f"Numba 首次呼叫（編譯或讀取磁碟快取）: {(time.perf_counter() - start) * 1000:.0f} ms")
+    else:
+        print("未安裝 Numba，只測試 NumPy/scipy 後端")
+
+    print(f"{'核心':<6} " + " ".join(f"{b + ' ns/樣本':>16}" for b in backends))
+    for name, run in kernels.items():
+        costs = []
+        for backend in backends:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run(backend)
+                best = min(best, time.perf_counter() - start)
+            costs.append(best / len(x) * 1e9)
+        print(f"{name:<6} " + " ".join(f"{c:16.2f}" for c in costs))
+
+    # 參考：原本的 pydub 逐樣本迴圈與卷積混響
+    from Test_pyttsx3_v08 import apply_reverb as convolve_reverb
+    segment = AudioSegment(np.clip(x, -32768, 32767).astype(np.int16).tobytes(),
+                           frame_rate=frame_rate, sample_width=2, channels=1)
+    for name, run in (('pydub 低通', lambda: segment.low_pass_filter(4500)),
+                      ('卷積混響', lambda: convolve_reverb(segment, 0.2))):
+        start = time.perf_counter()
+        run()
+        print(f"{name:<6} {(time.perf_counter() - start) / len(x) * 1e9:16.2f}（參考）")
+
+if __name__ == "__main__":
+    benchmark()
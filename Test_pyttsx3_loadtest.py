@@ -0,0 +1,251 @@
+"""
+負載測試：以 MQTT 風格的訊息序列壓測 natural_tts。
+
+訊息由發佈執行緒依時間戳放進行程內的佇列（代替 MQTT broker），
+訂閱執行緒取出後呼叫 natural_tts，音訊交給空輸出（不播放）。
+
+報告：
+    吞吐量（則/秒）、入列到第一段音訊的延遲 p50/p95/p99、
+    入列到完成的延遲、佇列深度隨時間變化、即時率（處理時間 / 音訊長度）。
+
+用法：
+    python Test_pyttsx3_loadtest.py --trace poisson --rate 2 --duration 60
+    python Test_pyttsx3_loadtest.py --trace bursty --engine fake
+    python Test_pyttsx3_loadtest.py --consumers 4          （每個訂閱執行緒使用各自子行程中的引擎）
+    python Test_pyttsx3_loadtest.py --trace recorded.jsonl --take-cache
+"""
+from pydub import AudioSegment
+from functools import partial
+import numpy as np
+import threading
+import argparse
+import random
+import queue
+import json
+import time
+import os
+
+from Test_pyttsx3_v08 import TakeCache, init_engine, natural_tts, synthesize_sentence
+from Test_pyttsx3_supervisor import EngineSupervisor
+
+PHRASES = (
+    "你好，歡迎光臨。",
+    "請稍候，馬上為您服務。",
+    "您的號碼是一百零五號，請到三號櫃台。",
+    "今天天氣很好，來試試免費健康測量吧！",
+    "感謝您的耐心等候。",
+    "系統即將進行維護，請於十分鐘後再試。",
+)
+# 假引擎的合成成本：每秒音訊需要的處理秒數
+FAKE_ENGINE_RTF = 0.15
+# 佇列深度取樣間隔（秒）
+DEPTH_INTERVAL = 0.1
+
+def poisson_trace(rate, duration, phrases=PHRASES):
+    """平均每秒 rate 則、到達間隔為指數分布的訊息序列。"""
+    t = 0.0
+    trace = []
+    while True:
+        t += random.expovariate(rate)
+        if t >= duration:
+            return trace
+        trace.append((t, random.choice(phrases)))
+
+def bursty_trace(rate, duration, burst_size=8, phrases=PHRASES):
+    """訊息成批同時到達，平均速率與 rate 相同。"""
+    trace = []
+    t = 0.0
+    while True:
+        t += random.expovariate(rate / burst_size)
+        if t >= duration:
+            return trace
+        trace.extend((t + i * 0.005, random.choice(phrases)) for i in range(burst_size))
+
+def repeated_trace(rate, duration, phrases=PHRASES, skew=1.5):
+    """Poisson 到達，但內容依 Zipf 分布集中在少數句子（重複句為主）。"""
+    weights = [1.0 / (rank + 1) ** skew for rank in range(len(phrases))]
+    return [(t, random.choices(phrases, weights)[0]) for t, _ in poisson_trace(rate, duration, phrases)]
+
+def load_trace(path):
+    """讀取錄製的訊息序列，每行為 {"t": 秒數, "payload": 文字}。"""
+    with open(path, encoding='utf-8') as trace_file:
+        records = [json.loads(line) for line in trace_file if line.strip()]
+    start = min(r['t'] for r in records) if records else 0.0
+    return sorted((r['t'] - start, r['payload']) for r in records)
+
+def fake_synthesizer(sample_path, rtf=FAKE_ENGINE_RTF):
+    """
+    不需要 SAPI 的假引擎：固定返回測試語音，並依 rtf 模擬合成耗時。
+
+    返回：
+        callable: 與 synthesize_sentence(engine, ...) 去掉 engine 後相同介面的函式。
+    """
+    sample = AudioSegment.from_wav(sample_path)
+
+    def synthesize(sentence, rate, volume):
+        time.sleep(len(sample) / 1000 * rtf)
+        return sample
+
+    return synthesize
+
+class NullSink:
+    """空音訊輸出：只記錄第一段音訊的時間與總音訊長度。"""
+
+    def __init__(self):
+        self.first_audio = None
+        self.audio_ms = 0
+
+    def __call__(self, audio_segment):
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter()
+        self.audio_ms += len(audio_segment)
+
+def run_load(trace, make_synthesize, consumers=1, take_cache=None, check=True):
+    """
+    重播訊息序列並收集統計。
+
+    參數：
+        trace (list): [(到達秒數, 文字), ...]。
+        make_synthesize (callable): 為每個訂閱執行緒建立合成函式。pyttsx3.init() 依驅動快取引擎，
+            同一行程內每次呼叫都拿到同一個引擎，多個訂閱執行緒不能各自 init_engine()，
+            須改用各自子行程中的引擎（例如 EngineSupervisor(engines=consumers).synthesize）。
+        consumers (int): 訂閱執行緒數。
+        take_cache (TakeCache): 指定時啟用「合成一次」模式。
+        check (bool): 是否讓 natural_tts 檢查 ffmpeg。
+
+    返回：
+        dict: 統計結果。
+    """
+    broker = queue.Queue()
+    results = []
+    results_lock = threading.Lock()
+    depth = []
+    done = threading.Event()
+
+    def subscriber():
+        synthesize = make_synthesize()
+        while True:
+            message = broker.get()
+            if message is None:
+                return
+            enqueued, text = message
+            sink = NullSink()
+            started = time.perf_counter()
+            natural_tts(text, synthesize=synthesize, take_cache=take_cache, sink=sink, return_audio=False,
+                        check=check)
+            finished = time.perf_counter()
+            with results_lock:
+                results.append({
+                    'enqueued': enqueued,
+                    'first_audio': sink.first_audio,
+                    'finished': finished,
+                    'busy': finished - started,
+                    'audio_ms': sink.audio_ms,
+                })
+
+    def monitor(origin):
+        while not done.is_set():
+            depth.append((time.perf_counter() - origin, broker.qsize()))
+            time.sleep(DEPTH_INTERVAL)
+
+    workers = [threading.Thread(target=subscriber) for _ in range(consumers)]
+    for worker in workers:
+        worker.start()
+    origin = time.perf_counter()
+    watcher = threading.Thread(target=monitor, args=(origin,), daemon=True)
+    watcher.start()
+
+    # 發佈端依時間戳重播
+    for offset, text in trace:
+        delay = origin + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        broker.put((time.perf_counter(), text))
+    for _ in workers:
+        broker.put(None)
+    for worker in workers:
+        worker.join()
+    done.set()
+    elapsed = time.perf_counter() - origin
+
+    first = np.array([r['first_audio'] - r['enqueued'] for r in results if r['first_audio'] is not None])
+    total = np.array([r['finished'] - r['enqueued'] for r in results])
+    audio_s = sum(r['audio_ms'] for r in results) / 1000
+    busy_s = sum(r['busy'] for r in results)
+    stats = {
+        'messages': len(results),
+        'elapsed': elapsed,
+        'throughput': len(results) / elapsed if elapsed else 0.0,
+        'first_audio': np.percentile(first, [50, 95, 99]) if len(first) else None,
+        'total': np.percentile(total, [50, 95, 99]) if len(total) else None,
+        'rtf': busy_s / audio_s if audio_s else None,
+        'max_depth': max((d for _, d in depth), default=0),
+        'depth': depth,
+    }
+    if take_cache is not None:
+        stats['cache'] = (take_cache.hits, take_cache.misses)
+    return stats
+
+def report(stats):
+    """印出統計結果。"""
+    print(f"訊息數: {stats['messages']}，耗時 {stats['elapsed']:.1f} 秒")
+    print(f"吞吐量: {stats['throughput']:.2f} 則/秒")
+    if stats['first_audio'] is not None:
+        p50, p95, p99 = stats['first_audio'] * 1000
+        print(f"入列→第一段音訊: p50 {p50:.0f} ms / p95 {p95:.0f} ms / p99 {p99:.0f} ms")
+    if stats['total'] is not None:
+        p50, p95, p99 = stats['total'] * 1000
+        print(f"入列→完成:       p50 {p50:.0f} ms / p95 {p95:.0f} ms / p99 {p99:.0f} ms")
+    if stats['rtf'] is not None:
+        print(f"即時率 (RTF): {stats['rtf']:.3f}（小於 1 代表比播放快）")
+    print(f"最大佇列深度: {stats['max_depth']}")
+    if 'cache' in stats:
+        print(f"快取: 命中 {stats['cache'][0]} / 未命中 {stats['cache'][1]}")
+    # 佇列深度以每秒一列的簡易長條圖呈現
+    per_second = {}
+    for t, d in stats['depth']:
+        per_second[int(t)] = max(per_second.get(int(t), 0), d)
+    print("佇列深度（每秒最大值）:")
+    for second in sorted(per_second):
+        print(f"  {second:>4}s {'#' * per_second[second]} {per_second[second]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="natural_tts 負載測試")
+    parser.add_argument('--trace', default='poisson',
+                        help="poisson / bursty / repeated，或錄製序列的 .jsonl 路徑")
+    parser.add_argument('--rate', type=float, default=1.0, help="平均每秒訊息數")
+    parser.add_argument('--duration', type=float, default=30.0, help="合成序列的長度（秒）")
+    parser.add_argument('--consumers', type=int, default=1, help="訂閱執行緒數")
+    parser.add_argument('--engine', choices=('pyttsx3', 'fake'), default='pyttsx3',
+                        help="fake 使用測試語音檔模擬引擎，不需要 SAPI")
+    parser.add_argument('--take-cache', action='store_true', help="啟用合成一次模式（TakeCache）")
+    parser.add_argument('--seed', type=int, default=None, help="亂數種子，方便重現")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    generators = {'poisson': poisson_trace, 'bursty': bursty_trace, 'repeated': repeated_trace}
+    if args.trace in generators:
+        trace = generators[args.trace](args.rate, args.duration)
+    else:
+        trace = load_trace(args.trace)
+
+    supervisor = None
+    if args.engine == 'fake':
+        sample_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "你好，這是測試語音。")
+        make_synthesize = partial(fake_synthesizer, sample_path)
+    elif args.consumers > 1:
+        # 同一行程內的執行緒共用同一個 pyttsx3 引擎，每個訂閱執行緒改用各自子行程中的引擎
+        supervisor = EngineSupervisor(engines=args.consumers)
+        make_synthesize = lambda: supervisor.synthesize
+    else:
+        make_synthesize = lambda: partial(synthesize_sentence, init_engine())
+    # 假引擎不需要 ffmpeg（不播放、不輸出壓縮檔）
+    check = args.engine != 'fake'
+
+    take_cache = TakeCache() if args.take_cache else None
+    try:
+        report(run_load(trace, make_synthesize, args.consumers, take_cache, check))
+    finally:
+        if supervisor is not None:
+            supervisor.close()
@@ -0,0 +1,191 @@
+"""
+語音提示包：把固定提示預先經 natural_tts 處理鏈合成，打包成單一檔案，
+裝置端以 mmap 開啟，O(1) 查表後直接把 PCM 交給播放器，不需載入 pyttsx3 / scipy。
+
+檔案格式（little-endian）：
+    標頭   64 bytes：magic、版本、聲道、採樣率、槽數、項目數、索引/字串/PCM 起點
+    索引   槽數 x 32 bytes 的開放定址雜湊表：雜湊、字串位置、PCM 位置、影格數、字串長度
+    字串   所有提示文字（UTF-8）
+    PCM    所有提示的 int16 PCM，連續存放
+
+用法：
+    python Test_pyttsx3_promptpack.py build prompts.txt prompts.ttsp
+    python Test_pyttsx3_promptpack.py say prompts.ttsp "你好，歡迎光臨。"
+"""
+import hashlib
+import struct
+import mmap
+import sys
+
+MAGIC = b'TTSP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIIQQQ')
+HEADER_SIZE = 64
+SLOT = struct.Struct('<QQQII')
+SAMPLE_WIDTH = 2
+
+def prompt_key(text):
+    """提示文字正規化後的 UTF-8 鍵。"""
+    return text.strip().encode('utf-8')
+
+def key_hash(key):
+    """64 位元雜湊，0 保留給空槽。"""
+    value = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+    return value or 1
+
+def build_pack(prompts, path, base_rate=95, base_volume=0.8):
+    """
+    以 natural_tts 處理鏈合成提示並寫成提示包。
+
+    參數：
+        prompts (iterable): 提示文字。
+        path (str): 輸出路徑。
+        base_rate (int): 基礎語速（默認 95）。
+        base_volume (float): 基礎音量（默認 0.8）。
+
+    返回：
+        int: 寫入的提示數。
+    """
+    # 只有建包時才需要合成與 DSP 模組
+    from Test_pyttsx3_v08 import init_engine, natural_tts, synthesize_sentence
+    from functools import partial
+
+    synthesize = partial(synthesize_sentence, init_engine())
+    rendered = {}
+    frame_rate = channels = None
+    for text in prompts:
+        key = prompt_key(text)
+        if not key or key in rendered:
+            continue
+        audio = natural_tts(text, base_rate, base_volume, synthesize=synthesize, sink=lambda _: None)
+        if audio is None:
+            print(f"合成失敗，略過: {text}")
+            continue
+        if frame_rate is None:
+            frame_rate, channels = audio.frame_rate, audio.channels
+        audio = audio.set_frame_rate(frame_rate).set_channels(channels).set_sample_width(SAMPLE_WIDTH)
+        rendered[key] = audio.raw_data
+
+    # 槽數取 2 的次方且至少兩倍項目數，探測長度維持很短
+    slot_count = 1
+    while slot_count < 2 * max(1, len(rendered)):
+        slot_count *= 2
+    index_offset = HEADER_SIZE
+    keys_offset = index_offset + slot_count * SLOT.size
+    pcm_offset = keys_offset + sum(len(key) for key in rendered)
+    pcm_offset += -pcm_offset % 16  # PCM 起點對齊
+
+    slots = [None] * slot_count
+    key_pos = keys_offset
+    pcm_pos = pcm_offset
+    for key, pcm in rendered.items():
+        h = key_hash(key)
+        i = h & (slot_count - 1)
+        while slots[i] is not None:
+            i = (i + 1) & (slot_count - 1)
+        slots[i] = (h, key_pos, pcm_pos, len(pcm) // (SAMPLE_WIDTH * channels), len(key))
+        key_pos += len(key)
+        pcm_pos += len(pcm)
+
+    with open(path, 'wb') as pack:
+        header = HEADER.pack(MAGIC, VERSION, channels or 1, frame_rate or 0, slot_count,
+                             len(rendered), index_offset, keys_offset, pcm_offset)
+        pack.write(header.ljust(HEADER_SIZE, b'\0'))
+        for slot in slots:
+            pack.write(SLOT.pack(*slot) if slot else bytes(SLOT.size))
+        for key in rendered:
+            pack.write(key)
+        pack.write(bytes(pcm_offset - keys_offset - sum(len(key) for key in rendered)))
+        for pcm in rendered.values():
+            pack.write(pcm)
+    return len(rendered)
+
+class PromptPack:
+    """
+    以 mmap 開啟的提示包。get() 返回指向檔案內容的 memoryview，不複製 PCM。
+
+    注意：close() 前須先釋放所有 get() 取得的 memoryview。
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as pack:
+            self._map = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.channels, self.frame_rate, self.slot_count, self.count,
+         self._index_offset, self._keys_offset, self._pcm_offset) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"不是有效的提示包: {path}")
+        self._view = memoryview(self._map)
+
+    def get(self, text):
+        """
+        查詢提示的 PCM。
+
+        參數：
+            text (str): 提示文字。
+
+        返回：
+            memoryview: int16 PCM；未收錄時返回 None。
+        """
+        key = prompt_key(text)
+        h = key_hash(key)
+        mask = self.slot_count - 1
+        i = h & mask
+        for _ in range(self.slot_count):
+            slot_hash, key_pos, pcm_pos, frames, key_len = SLOT.unpack_from(self._map, self._index_offset + i * SLOT.size)
+            if key_len == 0:
+                return None
+            if slot_hash == h and self._view[key_pos:key_pos + key_len] == key:
+                return self._view[pcm_pos:pcm_pos + frames * SAMPLE_WIDTH * self.channels]
+            i = (i + 1) & mask
+        return None
+
+    def __contains__(self, text):
+        return self.get(text) is not None
+
+    def __len__(self):
+        return self.count
+
+    def say(self, text):
+        """
+        播放提示；未收錄時改用 natural_tts 即時合成。
+
+        參數：
+            text (str): 提示文字。
+        """
+        pcm = self.get(text)
+        if pcm is None:
+            print(f"提示包未收錄，改為即時合成: {text}")
+            from Test_pyttsx3_v08 import natural_tts
+            natural_tts(text)
+            return
+        # 播放失敗時也要釋放 view，否則 close() 會拋出 BufferError 蓋掉原本的錯誤
+        try:
+            import simpleaudio as sa
+            play_obj = sa.play_buffer(pcm, self.channels, SAMPLE_WIDTH, self.frame_rate)
+            play_obj.wait_done()
+        finally:
+            pcm.release()
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == 'build':
+        with open(sys.argv[2], encoding='utf-8') as prompt_file:
+            count = build_pack(prompt_file, sys.argv[3])
+        print(f"已寫入 {count} 個提示到 {sys.argv[3]}")
+    elif len(sys.argv) == 4 and sys.argv[1] == 'say':
+        with PromptPack(sys.argv[2]) as pack:
+            pack.say(sys.argv[3])
+    else:
+        print("用法: python Test_pyttsx3_promptpack.py build prompts.txt prompts.ttsp")
+        print("      python Test_pyttsx3_promptpack.py say prompts.ttsp 提示文字")
+        sys.exit(1)
@@ -0,0 +1,206 @@
+"""
+引擎監管：pyttsx3 在多個子行程中執行，每個請求都有期限，
+逾時或崩潰的子行程會被強制結束並重新啟動，失敗的句子以有上限的退避重試。
+
+用法：
+    with EngineSupervisor(timeout=10, engines=2) as supervisor:
+        natural_tts("你好，歡迎光臨。", synthesize=supervisor.synthesize)
+        print(supervisor.counters)
+"""
+from collections import Counter
+from pydub import AudioSegment
+import multiprocessing
+import threading
+import random
+import queue
+import time
+
+class SynthesisError(Exception):
+    """等不到閒置引擎，或重試用盡後仍無法合成。"""
+
+def _engine_worker(conn):
+    """子行程：持有一個 pyttsx3 引擎，逐一處理主行程送來的句子。"""
+    from Test_pyttsx3_v08 import init_engine, synthesize_sentence
+
+    engine = init_engine()
+    conn.send(('ready',))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        sentence, rate, volume = request
+        try:
+            audio = synthesize_sentence(engine, sentence, rate, volume)
+            conn.send(('ok', audio.raw_data, audio.frame_rate, audio.sample_width, audio.channels))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+class _Engine:
+    """一個引擎子行程與其連線；同一時間只由一個執行緒使用。"""
+
+    def __init__(self):
+        self.process = None
+        self.conn = None
+
+class EngineSupervisor:
+    """
+    監管子行程中的 pyttsx3 引擎池。
+
+    synthesize() 可直接傳給 natural_tts / render_to_file 的 synthesize 參數；
+    多執行緒呼叫時各自取用閒置的子行程，全部忙碌時最多等待 queue_timeout 秒。
+    重試前的退避期間不佔用子行程，卡住的句子只會拖住自己那一個引擎。
+    """
+
+    def __init__(self, timeout=10.0, retries=3, backoff=0.2, max_backoff=2.0, startup_timeout=30.0,
+                 engines=2, queue_timeout=None):
+        """
+        參數：
+            timeout (float): 單一請求的期限（秒）。
+            retries (int): 失敗後的最多重試次數。
+            backoff (float): 第一次重試前的等待時間（秒），之後每次加倍。
+            max_backoff (float): 重試等待時間上限（秒）。
+            startup_timeout (float): 子行程載入模組與初始化引擎的期限（秒），不計入請求期限。
+            engines (int): 引擎子行程數，第一次使用時才啟動。
+            queue_timeout (float): 等待閒置引擎的期限（秒），默認與 timeout 相同。
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.startup_timeout = startup_timeout
+        self.queue_timeout = timeout if queue_timeout is None else queue_timeout
+        self.counters = Counter()
+        self._counters_lock = threading.Lock()
+        self._engines = [_Engine() for _ in range(max(1, engines))]
+        self._idle = queue.Queue()
+        for engine in self._engines:
+            self._idle.put(engine)
+
+    def _count(self, key):
+        with self._counters_lock:
+            self.counters[key] += 1
+
+    def _spawn(self, engine):
+        """啟動新的引擎子行程，等待引擎初始化完成。"""
+        parent_conn, child_conn = multiprocessing.Pipe()
+        engine.process = multiprocessing.Process(target=_engine_worker, args=(child_conn,), daemon=True)
+        engine.process.start()
+        child_conn.close()
+        engine.conn = parent_conn
+        self._count('spawns')
+        try:
+            ready = engine.conn.poll(self.startup_timeout) and engine.conn.recv() == ('ready',)
+        except EOFError:
+            ready = False
+        if not ready:
+            self._count('startup_failures')
+            self._kill(engine)
+            raise RuntimeError("引擎子行程初始化失敗")
+
+    def _kill(self, engine):
+        """強制結束子行程（卡住的驅動程式不會回應正常關閉）。"""
+        if engine.process is None:
+            return
+        engine.process.terminate()
+        engine.process.join(1.0)
+        if engine.process.is_alive():
+            engine.process.kill()
+            engine.process.join()
+        engine.conn.close()
+        engine.process = None
+        engine.conn = None
+
+    def _attempt(self, engine, sentence, rate, volume):
+        """以指定的子行程送出一次請求並在期限內等待結果。"""
+        if engine.process is None or not engine.process.is_alive():
+            if engine.process is not None:
+                self._count('crashes')
+                self._kill(engine)
+            self._spawn(engine)
+        engine.conn.send((sentence, rate, volume))
+        if not engine.conn.poll(self.timeout):
+            self._count('timeouts')
+            self._kill(engine)
+            raise TimeoutError(f"合成逾時 ({self.timeout}s): {sentence}")
+        try:
+            reply = engine.conn.recv()
+        except EOFError:
+            self._count('crashes')
+            self._kill(engine)
+            raise RuntimeError(f"引擎子行程意外結束: {sentence}")
+        if reply[0] == 'error':
+            self._count('errors')
+            # 與 v07 相同，出錯後重新啟動引擎
+            self._kill(engine)
+            raise RuntimeError(reply[1])
+        _, raw, frame_rate, sample_width, channels = reply
+        return AudioSegment(raw, frame_rate=frame_rate, sample_width=sample_width, channels=channels)
+
+    def synthesize(self, sentence, rate, volume):
+        """
+        合成單句，介面與 synthesize_sentence(engine, ...) 去掉 engine 後相同。
+
+        參數：
+            sentence (str): 句子文本。
+            rate (int): 語速。
+            volume (float): 引擎音量。
+
+        返回：
+            AudioSegment: 引擎輸出的原始音訊。
+
+        例外：
+            SynthesisError: 等不到閒置引擎，或重試用盡後仍失敗。
+        """
+        self._count('requests')
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+            try:
+                engine = self._idle.get(timeout=self.queue_timeout)
+            except queue.Empty:
+                self._count('queue_timeouts')
+                self._count('failures')
+                raise SynthesisError(f"{self.queue_timeout}s 內沒有閒置引擎: {sentence}") from last_error
+            try:
+                audio = self._attempt(engine, sentence, rate, volume)
+                self._count('ok')
+                return audio
+            except (TimeoutError, RuntimeError, OSError) as e:
+                print(f"合成失敗（第 {attempt + 1} 次）: {e}")
+                last_error = e
+            finally:
+                self._idle.put(engine)
+        self._count('failures')
+        raise SynthesisError(f"重試 {self.retries} 次後仍失敗: {sentence}") from last_error
+
+    def close(self):
+        """通知子行程結束，逾時則強制結束。"""
+        for engine in self._engines:
+            if engine.process is None:
+                continue
+            try:
+                engine.conn.send(None)
+                engine.process.join(self.timeout)
+            except OSError:
+                pass
+            self._kill(engine)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+if __name__ == "__main__":
+    from Test_pyttsx3_v08 import natural_tts
+
+    with EngineSupervisor(timeout=10) as supervisor:
+        natural_tts("你好，我是小智，我會講台灣狗已！", synthesize=supervisor.synthesize)
+        natural_tts("你好", synthesize=supervisor.synthesize)
+        print(f"統計: {dict(supervisor.counters)}")
@@ -0,0 +1,227 @@
+"""
+樣板語音：固定片段預先合成並快取，只有變數欄位需要處理，
+數字由預先合成的字詞庫（零～九、兩、十、百、千、萬）拼接，不必呼叫引擎。
+
+用法：
+    speaker = TemplateSpeaker()
+    speaker.warm("歡迎光臨，您的號碼是 {n} 號")
+    speaker.speak("歡迎光臨，您的號碼是 {n} 號", n=105)
+"""
+from pydub.playback import play
+from functools import partial
+from string import Formatter
+import time
+
+from Test_pyttsx3_v08 import (
+    TakeCache, apply_effects, init_engine, prepare_take, prepare_takes, synthesize_sentence,
+    synthesize_with_retry, trim_silence,
+)
+
+DIGITS = '零一二三四五六七八九'
+# 字詞庫預設內容：數字與常用單位
+LEXICON = tuple(DIGITS) + ('兩', '十', '百', '千', '萬', '號', '分', '秒', '元', '位')
+# 片段之間的交叉淡化長度（毫秒）
+CROSSFADE_MS = 15
+# 各片段對齊的 RMS 響度（dBFS），與 LoudnessNormalizer 的目標一致
+LEVEL_DBFS = -20.0
+
+def number_to_chinese(n):
+    """
+    把非負整數轉成中文讀法的字元列表，例如 105 -> ['一', '百', '零', '五']。
+
+    依台灣口語，百、千前的 2 與單獨的兩萬讀作「兩」（2024 -> 兩千零二十四、
+    20000000 -> 兩千萬），個位與十位仍讀作「二」（12 -> 十二、320000 -> 三十二萬）。
+
+    參數：
+        n (int): 0 到 99999999 之間的整數。
+
+    返回：
+        list: 中文數字字元。
+    """
+    if not 0 <= n < 10 ** 8:
+        raise ValueError(f"超出支援範圍: {n}")
+    if n == 0:
+        return ['零']
+
+    def below_10000(m, leading):
+        chars = []
+        zero = False
+        for unit, power in (('千', 1000), ('百', 100), ('十', 10), ('', 1)):
+            digit = m // power % 10
+            if digit == 0:
+                zero = bool(chars) or leading
+                continue
+            if zero:
+                chars.append('零')
+                zero = False
+            # 「十二」而非「一十二」，只在最高位省略
+            if unit in ('千', '百') and digit == 2:
+                chars.append('兩')
+            elif not (unit == '十' and digit == 1 and not chars and not leading):
+                chars.append(DIGITS[digit])
+            if unit:
+                chars.append(unit)
+        return chars
+
+    high, low = divmod(n, 10000)
+    chars = []
+    if high:
+        chars = (['兩'] if high == 2 else below_10000(high, False)) + ['萬']
+    if low:
+        chars += below_10000(low, bool(high))
+    return chars
+
+class TemplateSpeaker:
+    """
+    以 str.format 樣板合成語音，固定片段與字詞庫都放在 TakeCache 中。
+
+    拼接時每個片段先對齊到相同響度，再以短交叉淡化接起來。
+    """
+
+    def __init__(self, synthesize=None, base_rate=95, base_volume=0.8, effects=apply_effects,
+                 take_cache=None, crossfade_ms=CROSSFADE_MS, level_dbfs=LEVEL_DBFS):
+        """
+        參數：
+            synthesize (callable): 合成函式，默認使用本行程的 pyttsx3 引擎。
+            base_rate (int): 基礎語速（默認 95）。
+            base_volume (float): 基礎音量（默認 0.8）。
+            effects (callable): 音色處理鏈（默認 apply_effects）。
+            take_cache (TakeCache): 片段快取，可與 natural_tts 共用。
+            crossfade_ms (int): 片段間交叉淡化長度（毫秒）。
+            level_dbfs (float): 片段對齊的 RMS 響度（dBFS）。
+        """
+        self._synthesize = synthesize
+        self.base_rate = base_rate
+        self.base_volume = base_volume
+        self.effects = effects
+        self.take_cache = take_cache if take_cache is not None else TakeCache()
+        self.crossfade_ms = crossfade_ms
+        self.level_dbfs = level_dbfs
+
+    @property
+    def synthesize(self):
+        # 第一次需要合成時才初始化引擎，字詞庫全命中時完全不碰引擎
+        if self._synthesize is None:
+            self._synthesize = partial(synthesize_sentence, init_engine())
+        return self._synthesize
+
+    def take(self, text):
+        """
+        取得一段文字的基礎錄音，未快取時合成一次。
+
+        參數：
+            text (str): 片段文字。
+
+        返回：
+            AudioSegment: 基礎錄音。
+        """
+        key = (text, self.base_rate, self.base_volume)
+        take = self.take_cache.get(key)
+        if take is None:
+            raw = synthesize_with_retry(self.synthesize, text, self.base_rate, self.base_volume)
+            try:
+                take = prepare_take(raw, self.effects, strict=True)
+            except Exception as e:
+                # 這次使用未處理的音訊，但不放進快取，下次再重新處理
+                print(f"音訊處理失敗，不快取: {e}")
+                take = trim_silence(raw)
+            else:
+                self.take_cache.put(key, take)
+        return take
+
+    def warm(self, *templates, lexicon=LEXICON):
+        """
+        預先合成樣板中的固定片段與字詞庫。
+
+        參數：
+            *templates (str): 要預熱的樣板。
+            lexicon (iterable): 要預熱的字詞。
+        """
+        texts = list(lexicon)
+        for template in templates:
+            for literal, _, _, _ in Formatter().parse(template):
+                if literal.strip():
+                    texts.append(literal.strip())
+        keys = [(text, self.base_rate, self.base_volume) for text in dict.fromkeys(texts)]
+        missing = [key for key in keys if self.take_cache.get(key) is None]
+        if not missing:
+            return
+        # 字詞庫多為極短片段，整批處理比逐段呼叫處理鏈快得多
+        raws = [synthesize_with_retry(self.synthesize, text, self.base_rate, self.base_volume)
+                for text, _, _ in missing]
+        for key, take in zip(missing, prepare_takes(raws, self.effects, strict=True)):
+            # 處理失敗的片段不快取，render 時由 take() 重新合成
+            if take is not None:
+                self.take_cache.put(key, take)
+
+    def pieces(self, value):
+        """
+        把變數值拆成可拼接的片段：整數走字詞庫，其他字串整段合成。
+
+        以 0 開頭的數字字串（例如 {n:03d} 格式化後的 005）逐位讀出：零零五。
+        """
+        if isinstance(value, int) and not isinstance(value, bool):
+            return number_to_chinese(value)
+        text = str(value).strip()
+        if text.isdigit():
+            if len(text) > 1 and text.startswith('0'):
+                return [DIGITS[int(digit)] for digit in text]
+            return number_to_chinese(int(text))
+        return [text] if text else []
+
+    def render(self, template, **values):
+        """
+        依樣板與變數值拼接語音。
+
+        參數：
+            template (str): str.format 樣板，例如 "您的號碼是 {n} 號"。
+            **values: 樣板變數。
+
+        返回：
+            AudioSegment: 拼接後的語音。
+        """
+        formatter = Formatter()
+        texts = []
+        for literal, field, spec, conversion in formatter.parse(template):
+            if literal.strip():
+                texts.append(literal.strip())
+            if field is not None:
+                value, _ = formatter.get_field(field, (), values)
+                value = formatter.convert_field(value, conversion)
+                if spec:
+                    value = formatter.format_field(value, spec)
+                texts.extend(self.pieces(value))
+
+        audio = None
+        for text in texts:
+            take = self.take(text)
+            if take.rms:
+                take = take.apply_gain(self.level_dbfs - take.dBFS)
+            if audio is None:
+                audio = take
+                continue
+            crossfade = min(self.crossfade_ms, len(audio), len(take))
+            audio = audio.append(take, crossfade=crossfade)
+        return audio
+
+    def speak(self, template, **values):
+        """拼接並直接播放。"""
+        audio = self.render(template, **values)
+        if audio is not None:
+            play(audio)
+        return audio
+
+if __name__ == "__main__":
+    template = "歡迎光臨，您的號碼是 {n} 號"
+    speaker = TemplateSpeaker()
+
+    start = time.perf_counter()
+    speaker.warm(template)
+    print(f"預熱耗時 {(time.perf_counter() - start) * 1000:.0f} ms，快取 {len(speaker.take_cache)} 個片段")
+
+    for n in (7, 15, 105, 2024):
+        start = time.perf_counter()
+        audio = speaker.render(template, n=n)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{n:>5}: {''.join(number_to_chinese(n))} 拼接耗時 {elapsed:.1f} ms，長度 {len(audio)} ms")
+        play(audio)
@@ -0,0 +1,766 @@
+import pyttsx3
+from pydub import AudioSegment
+from pydub.playback import play
+from pydub.utils import which
+from scipy.signal import convolve, fftconvolve, lfilter
+from functools import lru_cache, partial
+from collections import OrderedDict
+import numpy as np
+import random
+import tempfile
+import threading
+import os
+
+# 靜音判定門檻（dBFS），引擎前後的填充幾乎都是 0 樣本
+SILENCE_THRESH_DBFS = -60.0
+# 修剪後保留的邊緣（毫秒），避免切掉字頭的起音與字尾的餘音
+EDGE_KEEP_MS = 20
+# 句子間停頓範圍（毫秒）
+PAUSE_RANGE_MS = (500, 800)
+
+def check_ffmpeg():
+    """檢查 ffmpeg 是否可用"""
+    if not which("ffmpeg") or not which("ffprobe"):
+        raise EnvironmentError(
+            "FFmpeg or ffprobe not found. Please install FFmpeg and add it to your system PATH. "
+            "Download from https://www.gyan.dev/ffmpeg/builds/ and add the 'bin' folder to PATH."
+        )
+
+def adjust_pitch(audio_segment, semitones):
+    """
+    調整音高，模擬成熟女聲。
+
+    參數：
+        audio_segment (AudioSegment): 音訊對象。
+        semitones (float): 半音數（正數升高，負數降低）。
+
+    返回：
+        AudioSegment: 調整後的音訊。
+    """
+    new_sample_rate = int(audio_segment.frame_rate * (2**(semitones/12.0)))
+    pitched_sound = audio_segment._spawn(audio_segment.raw_data, overrides={'frame_rate': new_sample_rate})
+    return pitched_sound.set_frame_rate(audio_segment.frame_rate)
+
+@lru_cache(maxsize=16)
+def reverb_impulse(frame_rate, decay):
+    """
+    產生並快取混響的脈衝響應，同一組參數只計算一次。
+
+    參數：
+        frame_rate (int): 採樣率。
+        decay (float): 混響衰減係數。
+
+    返回：
+        numpy.ndarray: 長 0.2 秒的脈衝響應（唯讀）。
+    """
+    impulse_response = np.zeros(int(frame_rate * 0.2))
+    impulse_response[0] = 1
+    for i in range(1, len(impulse_response)):
+        impulse_response[i] = impulse_response[i - 1] * decay
+    impulse_response.setflags(write=False)
+    return impulse_response
+
+def apply_reverb(audio_segment, decay=0.2):
+    """
+    加入輕微混響，增加溫暖感。
+
+    參數：
+        audio_segment (AudioSegment): 音訊對象。
+        decay (float): 混響衰減係數（默認 0.2）。
+
+    返回：
+        AudioSegment: 加入混響的音訊。
+    """
+    samples = np.array(audio_segment.get_array_of_samples())
+    impulse_response = reverb_impulse(audio_segment.frame_rate, decay)
+    reverbed_samples = convolve(samples, impulse_response, mode='full')[:len(samples)]
+    reverbed_samples = np.clip(reverbed_samples, -2**15, 2**15 - 1).astype(np.int16)
+    return audio_segment._spawn(reverbed_samples.tobytes())
+
+def time_stretch(audio_segment, speed, frame_ms=25, tolerance_ms=10):
+    """
+    以 WSOLA 調整語速而不改變音高，取代 pydub 的 speedup（可加速也可減速）。
+
+    候選位置的互相關以 FFT 一次批次算完，逐影格只剩挑選最大值的簡單遞迴，
+    疊加（overlap-add）也是整批完成。
+
+    參數：
+        audio_segment (AudioSegment): 音訊對象。
+        speed (float): 語速倍數（0.5-2.0，大於 1 變快）。
+        frame_ms (float): 分析窗長度（毫秒）。
+        tolerance_ms (float): 對齊搜尋範圍（毫秒），應涵蓋一個基頻週期。
+
+    返回：
+        AudioSegment: 調整語速後的音訊。
+    """
+    if not 0.5 <= speed <= 2.0:
+        raise ValueError(f"speed 必須介於 0.5 與 2.0 之間: {speed}")
+    if speed == 1.0 or len(audio_segment) == 0:
+        return audio_segment
+
+    channels = audio_segment.channels
+    x = np.array(audio_segment.get_array_of_samples(), dtype=np.float64).reshape(-1, channels)
+    n_in = len(x)
+    n_out = int(round(n_in / speed))
+
+    hop = max(1, int(audio_segment.frame_rate * frame_ms / 2000))  # 輸出步長，窗長為兩倍
+    win_len = 2 * hop
+    tol = max(1, int(audio_segment.frame_rate * tolerance_ms / 1000))
+    ana_hop = hop * speed
+
+    # 第 k 個輸出影格對應的理想輸入位置（已含前端補零）
+    n_frames = n_out // hop + 2
+    front = int(np.ceil(ana_hop)) + 2 * tol + 1
+    ideal = front + np.round((np.arange(n_frames) - 1) * ana_hop).astype(np.int64)
+    total = int(ideal[-1]) + 2 * tol + 2 * win_len + hop + 1
+    padded = np.zeros((total, channels))
+    padded[front:front + n_in] = x
+    mono = padded.mean(axis=1)
+
+    # 批次互相關：上一影格的自然延續 vs. 本影格附近 ±2*tol 的候選
+    span = win_len + 4 * tol
+    template = mono[(ideal[:-1] + hop)[:, None] + np.arange(win_len)]
+    search = mono[(ideal[1:] - 2 * tol)[:, None] + np.arange(span)]
+    n_fft = 1 << int(np.ceil(np.log2(span + win_len)))
+    corr = np.fft.irfft(np.fft.rfft(search, n_fft) * np.conj(np.fft.rfft(template, n_fft)), n_fft)
+    corr = corr[:, :4 * tol + 1]
+
+    # 互相關只與兩影格偏移量的差有關，逐影格挑最大值即可
+    offsets = np.zeros(n_frames, dtype=np.int64)
+    for k in range(1, n_frames):
+        lo = tol - offsets[k - 1]
+        offsets[k] = int(np.argmax(corr[k - 1, lo:lo + 2 * tol + 1])) - tol
+
+    # 整批 overlap-add，50% 重疊的 Hann 窗相加恆為 1
+    window = np.hanning(win_len + 1)[:win_len]
+    frames = padded[(ideal + offsets)[:, None] + np.arange(win_len)] * window[None, :, None]
+    out = np.zeros(((n_frames + 1) * hop, channels))
+    out[:n_frames * hop] += frames[:, :hop].reshape(-1, channels)
+    out[hop:(n_frames + 1) * hop] += frames[:, hop:].reshape(-1, channels)
+    out = out[hop:hop + n_out]
+
+    full_scale = float(1 << (8 * audio_segment.sample_width - 1))
+    out = np.clip(np.round(out), -full_scale, full_scale - 1)
+    out = out.astype({1: np.int8, 2: np.int16, 4: np.int32}[audio_segment.sample_width])
+    return audio_segment._spawn(out.tobytes())
+
+def apply_effects(audio_segment, semitones=0.3, cutoff=4500, decay=0.2, speed=1.0):
+    """
+    音色處理鏈：語速調整、音高調整、低通濾波、混響。
+
+    參數：
+        audio_segment (AudioSegment): 音訊對象。
+        semitones (float): 音高調整半音數（默認 +0.3）。
+        cutoff (int): 低通濾波截止頻率（默認 4500 Hz）。
+        decay (float): 混響衰減係數（默認 0.2）。
+        speed (float): 語速倍數（默認 1.0，不調整）。
+
+    返回：
+        AudioSegment: 處理後的音訊。
+    """
+    audio = time_stretch(audio_segment, speed)
+    audio = adjust_pitch(audio, semitones)
+    audio = audio.low_pass_filter(cutoff)
+    return apply_reverb(audio, decay=decay)
+
+def pack_batch(segments):
+    """
+    把多段單聲道 16-bit 音訊打包成補零的 (batch, samples) float32 陣列。
+
+    參數：
+        segments (list): AudioSegment 列表，採樣率須相同。
+
+    返回：
+        tuple: (陣列, 各段長度)。
+    """
+    lengths = np.array([int(s.frame_count()) for s in segments], dtype=np.int64)
+    batch = np.zeros((len(segments), int(lengths.max(initial=0))), dtype=np.float32)
+    for row, segment in zip(batch, segments):
+        samples = np.frombuffer(segment.raw_data, dtype=np.int16)
+        row[:len(samples)] = samples
+    return batch, lengths
+
+def unpack_batch(batch, lengths):
+    """依長度切回各段，返回指向原陣列的 view，不複製資料。"""
+    return [batch[i, :n] for i, n in enumerate(lengths)]
+
+def apply_effects_batch_array(batch, lengths, frame_rate, semitones=0.3, cutoff=4500, decay=0.2, normalize=False):
+    """
+    對整批補零陣列執行音色處理鏈，每一步都是沿 axis 1 的單次向量化運算。
+
+    參數：
+        batch (numpy.ndarray): (batch, samples) float32 陣列（int16 刻度）。
+        lengths (numpy.ndarray): 各段有效長度。
+        frame_rate (int): 採樣率。
+        semitones (float): 音高調整半音數。
+        cutoff (int): 低通濾波截止頻率。
+        decay (float): 混響衰減係數。
+        normalize (bool): 是否逐段做峰值正規化（等同 AudioSegment.normalize()）。
+
+    返回：
+        tuple: (處理後陣列, 各段新長度)。
+    """
+    if batch.size == 0:
+        return batch, lengths
+
+    # 音高調整：與 adjust_pitch 相同，先以較高採樣率解讀再線性內插回原採樣率
+    new_rate = int(frame_rate * (2**(semitones/12.0)))
+    step = new_rate / frame_rate
+    lengths = (lengths * frame_rate) // new_rate
+    pos = np.arange(int(lengths.max()), dtype=np.float64) * step
+    left = np.minimum(pos.astype(np.int64), batch.shape[1] - 1)
+    right = np.minimum(left + 1, batch.shape[1] - 1)
+    frac = (pos - left).astype(np.float32)
+    batch = batch[:, left] * (1 - frac) + batch[:, right] * frac
+
+    # 低通濾波：與 pydub low_pass_filter 相同的一階 IIR，初值為第一個樣本
+    rc = 1.0 / (cutoff * 2 * np.pi)
+    dt = 1.0 / frame_rate
+    alpha = dt / (rc + dt)
+    b = np.array([alpha], dtype=np.float32)
+    a = np.array([1, alpha - 1], dtype=np.float32)
+    batch, _ = lfilter(b, a, batch, axis=1, zi=-a[1] * batch[:, :1])
+
+    # 混響：整批 FFT 卷積，補零區不影響有效長度內的結果
+    impulse_response = reverb_impulse(frame_rate, decay).astype(np.float32)
+    batch = fftconvolve(batch, impulse_response[None, :], axes=1)[:, :batch.shape[1]]
+    np.clip(batch, -2**15, 2**15 - 1, out=batch)
+
+    # 清掉各段有效長度之後的殘值
+    batch[np.arange(batch.shape[1])[None, :] >= lengths[:, None]] = 0
+
+    if normalize:
+        peaks = np.abs(batch).max(axis=1, keepdims=True)
+        target = (2**15) * 10 ** (-0.1 / 20)
+        batch *= np.where(peaks > 0, target / np.maximum(peaks, 1), 1).astype(np.float32)
+    return batch, lengths
+
+def apply_effects_batch(segments, semitones=0.3, cutoff=4500, decay=0.2, normalize=False):
+    """
+    一次處理多段音訊，短提示大量處理時可省下逐段呼叫的開銷。
+
+    參數：
+        segments (list): AudioSegment 列表（單聲道、16-bit、採樣率相同）。
+        semitones (float): 音高調整半音數。
+        cutoff (int): 低通濾波截止頻率。
+        decay (float): 混響衰減係數。
+        normalize (bool): 是否逐段做峰值正規化。
+
+    返回：
+        list: 處理後的 AudioSegment；格式不符時逐段改用 apply_effects。
+    """
+    if not segments:
+        return []
+    first = segments[0]
+    if any(s.channels != 1 or s.sample_width != 2 or s.frame_rate != first.frame_rate for s in segments):
+        out = [apply_effects(s, semitones, cutoff, decay) for s in segments]
+        return [s.normalize() for s in out] if normalize else out
+    batch, lengths = pack_batch(segments)
+    batch, lengths = apply_effects_batch_array(batch, lengths, first.frame_rate, semitones, cutoff, decay, normalize)
+    # 取整與截幅就地進行；轉 int16 複製一次，AudioSegment 需要 bytes，每段再複製一次
+    np.round(batch, out=batch)
+    np.clip(batch, -2**15, 2**15 - 1, out=batch)
+    pcm = batch.astype(np.int16)
+    return [s._spawn(row.tobytes()) for s, row in zip(segments, unpack_batch(pcm, lengths))]
+
+def voiced_bounds(audio_segment, thresh_dbfs=SILENCE_THRESH_DBFS):
+    """
+    以向量化方式找出有聲區段的起訖影格（frame）位置。
+
+    參數：
+        audio_segment (AudioSegment): 音訊對象。
+        thresh_dbfs (float): 靜音門檻（dBFS）。
+
+    返回：
+        tuple: (起始影格, 結束影格)，全為靜音時返回 (0, 0)。
+    """
+    samples = np.array(audio_segment.get_array_of_samples())
+    if samples.size == 0:
+        return 0, 0
+    full_scale = float(1 << (8 * audio_segment.sample_width - 1))
+    threshold = full_scale * (10 ** (thresh_dbfs / 20.0))
+    # 多聲道取各影格的最大振幅
+    frames = np.abs(samples.reshape(-1, audio_segment.channels).astype(np.int32)).max(axis=1)
+    voiced = np.flatnonzero(frames > threshold)
+    if voiced.size == 0:
+        return 0, 0
+    return int(voiced[0]), int(voiced[-1]) + 1
+
+def trim_silence(audio_segment, thresh_dbfs=SILENCE_THRESH_DBFS, keep_ms=EDGE_KEEP_MS):
+    """
+    修剪引擎在音訊前後加入的靜音填充。
+
+    參數：
+        audio_segment (AudioSegment): 音訊對象。
+        thresh_dbfs (float): 靜音門檻（dBFS）。
+        keep_ms (int): 修剪後在兩端保留的邊緣（毫秒）。
+
+    返回：
+        AudioSegment: 修剪後的音訊，全為靜音時返回空音訊。
+    """
+    start, end = voiced_bounds(audio_segment, thresh_dbfs)
+    if end == 0:
+        return audio_segment._spawn(b'')
+    keep = int(audio_segment.frame_rate * keep_ms / 1000)
+    start = max(0, start - keep)
+    end = min(int(audio_segment.frame_count()), end + keep)
+    width = audio_segment.frame_width
+    return audio_segment._spawn(audio_segment.raw_data[start * width:end * width])
+
+def make_pause(audio_segment, duration_ms):
+    """
+    產生與參考音訊同格式、長度精確的 PCM 靜音。
+
+    參數：
+        audio_segment (AudioSegment): 參考音訊（取其採樣率、聲道與位元寬度）。
+        duration_ms (float): 停頓長度（毫秒）。
+
+    返回：
+        AudioSegment: 靜音音訊。
+    """
+    n_frames = int(round(audio_segment.frame_rate * duration_ms / 1000.0))
+    return audio_segment._spawn(bytes(n_frames * audio_segment.frame_width))
+
+def limiter_gain(x, ceiling, attack_step, release_step):
+    """
+    前瞻限幅器的增益包絡，保證 abs(x * gain) 不超過 ceiling。
+
+    參數：
+        x (numpy.ndarray): 樣本或每個影格的峰值。
+        ceiling (float): 峰值上限（與 x 同刻度）。
+        attack_step (float): 峰值之前每個樣本最多下降的增益。
+        release_step (float): 峰值之後每個樣本最多回升的增益。
+
+    返回：
+        numpy.ndarray: 每個樣本的增益（0-1）。
+    """
+    peak = np.abs(x)
+    need = np.where(peak > ceiling, ceiling / np.maximum(peak, 1e-12), 1.0)
+    # min(need[k] + (n - k) * step) 可寫成累積最小值
+    idx = np.arange(len(x))
+    forward = np.minimum(idx * release_step + np.minimum.accumulate(need - idx * release_step), 1.0)
+    backward = np.minimum.accumulate((forward + idx * attack_step)[::-1])[::-1] - idx * attack_step
+    return np.minimum(backward, 1.0)
+
+class LoudnessNormalizer:
+    """
+    以區塊累積統計量做響度正規化，取代逐句掃描峰值的 normalize()。
+
+    每個區塊計算均方值，低於門檻的區塊（靜音、停頓）不納入統計，
+    整段語音共用一個平滑後的增益，因此句與句之間的相對音量得以保留，
+    也不需要事先取得整句音訊，可直接用在串流路徑上。
+    峰值由前瞻限幅器壓在 ceiling_dbfs 以下，任何樣本都不會超過上限。
+    """
+
+    def __init__(self, target_dbfs=-20.0, block_ms=50, gate_dbfs=-50.0,
+                 smoothing_ms=400, max_gain_db=20.0, ceiling_dbfs=-0.5, lookahead_ms=5, release_ms=80):
+        """
+        參數：
+            target_dbfs (float): 目標 RMS 響度（dBFS）。
+            block_ms (int): 統計區塊長度（毫秒）。
+            gate_dbfs (float): 區塊響度低於此值時不納入統計。
+            smoothing_ms (float): 增益平滑時間常數（毫秒）。
+            max_gain_db (float): 最大增益，避免放大底噪。
+            ceiling_dbfs (float): 峰值上限（dBFS）。
+            lookahead_ms (float): 限幅器起音時間（毫秒），增益在峰值前這段時間內降下。
+            release_ms (float): 限幅器增益從 0 回升到 1 所需時間（毫秒）。
+        """
+        self.target = 10 ** (target_dbfs / 20.0)
+        self.block_ms = block_ms
+        self.gate = 10 ** (gate_dbfs / 20.0)
+        self.alpha = 1.0 - np.exp(-block_ms / float(smoothing_ms))
+        self.max_gain = 10 ** (max_gain_db / 20.0)
+        self.ceiling = 10 ** (ceiling_dbfs / 20.0)
+        self.lookahead_ms = lookahead_ms
+        self.release_ms = release_ms
+        self.reset()
+
+    def reset(self):
+        """清除累積統計量，開始新的一段語音。"""
+        self.energy = 0.0
+        self.count = 0
+        self.gain = None
+
+    def process(self, audio_segment):
+        """
+        對一段音訊套用響度增益，並更新累積統計量。
+
+        參數：
+            audio_segment (AudioSegment): 音訊對象（可為串流中的一個片段）。
+
+        返回：
+            AudioSegment: 套用增益後的音訊。
+        """
+        full_scale = float(1 << (8 * audio_segment.sample_width - 1))
+        samples = np.array(audio_segment.get_array_of_samples(), dtype=np.float64) / full_scale
+        frames = samples.reshape(-1, audio_segment.channels)
+        n = len(frames)
+        if n == 0:
+            return audio_segment
+
+        block = max(1, int(audio_segment.frame_rate * self.block_ms / 1000))
+        n_blocks = -(-n // block)
+        padded = np.zeros((n_blocks * block, frames.shape[1]))
+        padded[:n] = frames
+        blocks = padded.reshape(n_blocks, -1)
+        lengths = np.full(n_blocks, block * frames.shape[1])
+        lengths[-1] = (n - (n_blocks - 1) * block) * frames.shape[1]
+        sums = np.einsum('ij,ij->i', blocks, blocks)
+        peaks = np.abs(blocks).max(axis=1)
+        gated = np.sqrt(sums / lengths) > self.gate
+
+        # 逐區塊更新累積統計與平滑增益（每秒僅數十個區塊）
+        gains = np.empty(n_blocks)
+        for b in range(n_blocks):
+            if gated[b]:
+                self.energy += sums[b]
+                self.count += lengths[b]
+            if self.count:
+                wanted = min(self.target / np.sqrt(self.energy / self.count), self.max_gain)
+                self.gain = wanted if self.gain is None else self.gain + self.alpha * (wanted - self.gain)
+            g = 1.0 if self.gain is None else self.gain
+            if peaks[b] > 0:
+                g = min(g, self.ceiling / peaks[b])
+            gains[b] = g
+
+        # 區塊間線性內插，避免增益跳動產生雜音
+        centers = (np.arange(n_blocks) + 0.5) * block
+        envelope = np.interp(np.arange(n), centers, gains)
+        out = frames * envelope[:, None]
+        # 內插會把下一區塊較大的增益帶到峰值上，最後以逐影格的前瞻限幅器壓住
+        attack_step = 1.0 / max(1.0, audio_segment.frame_rate * self.lookahead_ms / 1000)
+        release_step = 1.0 / max(1.0, audio_segment.frame_rate * self.release_ms / 1000)
+        out *= limiter_gain(np.abs(out).max(axis=1), self.ceiling, attack_step, release_step)[:, None]
+        out *= full_scale
+        out = np.clip(np.round(out), -full_scale, full_scale - 1)
+        out = out.astype({1: np.int8, 2: np.int16, 4: np.int32}[audio_segment.sample_width])
+        return audio_segment._spawn(out.tobytes())
+
+def synthesize_sentence(engine, sentence, rate, volume):
+    """
+    以 pyttsx3 引擎合成單句，返回未處理的音訊。
+
+    參數：
+        engine: pyttsx3 引擎。
+        sentence (str): 句子文本。
+        rate (int): 語速。
+        volume (float): 引擎音量。
+
+    返回：
+        AudioSegment: 引擎輸出的原始音訊。
+    """
+    engine.stop()  # 停止任何現有任務
+    engine.setProperty('rate', rate)
+    engine.setProperty('volume', min(volume, 1.0))
+
+    # 使用臨時 WAV 檔案進行波形處理
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
+        temp_file_name = tmp_file.name
+    try:
+        engine.save_to_file(sentence, temp_file_name)
+        engine.runAndWait()
+        return AudioSegment.from_wav(temp_file_name)
+    finally:
+        os.remove(temp_file_name)
+
+def synthesize_with_retry(synthesize, sentence, rate, volume):
+    """合成單句，遇到 RuntimeError 時停止引擎並重試一次。"""
+    try:
+        return synthesize(sentence, rate, volume)
+    except RuntimeError as e:
+        print(f"RuntimeError encountered: {e}. Trying to stop and restart.")
+        return synthesize(sentence, rate, volume)
+
+def prepare_take(raw, effects=apply_effects, strict=False):
+    """
+    修剪引擎填充並套用音色處理鏈，得到與語氣無關、可重複使用的基礎錄音。
+
+    參數：
+        raw (AudioSegment): 引擎輸出的原始音訊。
+        effects (callable): 音色處理鏈，可換成 DspPool.process 交給子行程執行。
+        strict (bool): 處理鏈失敗時是否拋出例外；默認改為返回未處理的音訊。
+            要放進快取的錄音應設為 True，避免一次暫時性的失敗被長期保留。
+
+    返回：
+        AudioSegment: 基礎錄音。
+    """
+    # 先修剪引擎填充，後續處理只作用在有聲區段
+    audio = trim_silence(raw)
+    if len(audio) < 100:  # 音訊過短，跳過處理
+        print(f"音訊過短 ({len(audio)}ms)，不做處理")
+        return audio
+    try:
+        # 語速、音高調整、低通濾波、混響
+        return effects(audio)
+    except Exception as e:
+        if strict:
+            raise
+        print(f"音訊處理失敗: {e}")
+        return audio  # 使用原始音訊
+
+def prepare_takes(raws, effects=apply_effects, strict=False):
+    """
+    一次準備多段基礎錄音；使用預設處理鏈時整批以 apply_effects_batch 處理。
+
+    參數：
+        raws (list): 引擎輸出的原始音訊。
+        effects (callable): 音色處理鏈。
+        strict (bool): 為 True 時處理失敗的項目返回 None，而不是未處理的音訊。
+
+    返回：
+        list: 基礎錄音，順序與輸入相同。
+    """
+    def one(raw):
+        try:
+            return prepare_take(raw, effects, strict)
+        except Exception as e:
+            print(f"音訊處理失敗: {e}")
+            return None
+
+    if effects is not apply_effects:
+        return [one(raw) for raw in raws]
+    takes = [trim_silence(raw) for raw in raws]
+    # 過短的音訊與 prepare_take 相同，不做處理
+    todo = [i for i, take in enumerate(takes) if len(take) >= 100]
+    try:
+        for i, take in zip(todo, apply_effects_batch([takes[i] for i in todo])):
+            takes[i] = take
+    except Exception as e:
+        # 整批失敗時逐段重做，只有真正出錯的那段保留未處理的音訊（strict 時為 None）
+        print(f"批次音訊處理失敗，改為逐段處理: {e}")
+        for i in todo:
+            takes[i] = one(takes[i])
+    return takes
+
+def finish_take(take, normalizer=None, gain=1.0, speed=1.0):
+    """
+    對基礎錄音套用每次播放不同的語速微調、響度正規化與語氣增益。
+
+    參數：
+        take (AudioSegment): prepare_take 產生的基礎錄音。
+        normalizer (LoudnessNormalizer): 整段語音共用的響度正規化器，None 時沿用 normalize()。
+        gain (float): 正規化後套用的語氣增益倍數（開頭柔和、結尾上揚、強調）。
+        speed (float): 語速倍數，以 time_stretch 在 PCM 上調整。
+
+    返回：
+        AudioSegment: 處理後的音訊。
+    """
+    if len(take) < 100:
+        return take
+    try:
+        audio = time_stretch(take, speed)
+        # 正規化音量
+        if normalizer is None:
+            audio = audio.normalize()
+        else:
+            audio = normalizer.process(audio)
+        # 語氣增益放在正規化之後，才不會被抵銷；放大時不超過滿刻度
+        if gain != 1.0:
+            audio = audio.apply_gain(min(20 * np.log10(gain), -audio.max_dBFS))
+        return audio
+    except Exception as e:
+        print(f"音訊處理失敗: {e}")
+        return take
+
+def process_sentence(raw, normalizer=None, gain=1.0, effects=apply_effects):
+    """
+    對單句原始音訊做修剪與波形處理（prepare_take + finish_take）。
+
+    返回：
+        AudioSegment: 處理後的音訊。
+    """
+    return finish_take(prepare_take(raw, effects), normalizer, gain)
+
+class TakeCache:
+    """
+    基礎錄音快取（LRU），鍵為 (句子, 基礎語速, 基礎音量)。
+
+    每句只以基礎語速合成一次，之後的語速與音量變化都在 PCM 上完成，
+    重複出現的句子不再呼叫引擎。多執行緒共用時以鎖保護。
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._takes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """取出基礎錄音，未命中返回 None。"""
+        with self._lock:
+            take = self._takes.get(key)
+            if take is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._takes.move_to_end(key)
+            return take
+
+    def put(self, key, take):
+        """存入基礎錄音，超過上限時淘汰最久未使用的項目。"""
+        with self._lock:
+            self._takes[key] = take
+            self._takes.move_to_end(key)
+            while len(self._takes) > self.max_entries:
+                self._takes.popitem(last=False)
+
+    def __len__(self):
+        return len(self._takes)
+
+def init_engine():
+    """
+    初始化 pyttsx3 引擎並固定使用 Voice 0 (Hanhan)。
+
+    返回：
+        pyttsx3.Engine: 引擎。
+    """
+    engine = pyttsx3.init()
+    voices = engine.getProperty('voices')
+    # 打印可用語音以確認 Hanhan 是否為 voices[0]
+    for i, voice in enumerate(voices):
+        print(f"Voice {i}: {voice.name}, ID: {voice.id}")
+    engine.setProperty('voice', voices[0].id)  # 固定 Hanhan
+    return engine
+
+def split_sentences(text):
+    """
+    依句末標點分割句子。
+
+    參數：
+        text (str): 文本。
+
+    返回：
+        list: 去除空白後的句子。
+    """
+    sentences = text.replace('。', '。|').replace('！', '！|').replace('？', '？|').split('|')
+    return [s.strip() for s in sentences if s.strip()]
+
+def sentence_prosody(sentence, is_first, is_last):
+    """
+    計算單句的語速倍數與語氣增益。
+
+    參數：
+        sentence (str): 句子文本。
+        is_first (bool): 是否為開頭句。
+        is_last (bool): 是否為結尾句。
+
+    返回：
+        tuple: (語速倍數, 增益倍數)。
+    """
+    # 關鍵詞強調
+    emphasis = 1.0
+    if any(keyword in sentence for keyword in ['你好', '小智', '歡迎', '試試', '台灣']):
+        emphasis = 1.003  # 極微強調，成熟語氣
+
+    # 隨機調整語速（±0.3%）
+    speed = (0.997 + random.uniform(0.0, 0.006)) * emphasis
+
+    # 隨機調整音量（±0.3%），在響度正規化後以增益套用
+    gain = (0.997 + random.uniform(0.0, 0.006)) * emphasis
+    if is_first:
+        gain *= 0.85  # 開頭柔和
+    elif is_last:
+        gain *= 1.05  # 結尾微上揚
+    return speed, gain
+
+def natural_tts(text, base_rate=95, base_volume=0.8, output_path=None, effects=apply_effects, synthesize=None,
+                take_cache=None, sink=play, normalizer=None, return_audio=True, check=True):
+    """
+    生成接近真實成熟女聲的語音，說繁體中文，適配 MQTT。
+
+    句子間的停頓以精確長度的 PCM 靜音插入，不再依賴 time.sleep；
+    音量以整段語音的累積響度正規化，開頭與結尾的語氣增益在其後套用。
+
+    參數：
+        text (str): 要轉換的文本。
+        base_rate (int): 基礎語速（默認 95）。
+        base_volume (float): 基礎音量（默認 0.8）。
+        output_path (str): 指定時輸出整段語音到 WAV 檔案，不直接播放。
+        effects (callable): 音色處理鏈（默認 apply_effects）。
+        synthesize (callable): 合成函式 (sentence, rate, volume) -> AudioSegment，
+            默認使用本行程的 pyttsx3 引擎，可換成 EngineSupervisor.synthesize。
+        take_cache (TakeCache): 指定時每句只以基礎語速合成一次，語速與音量變化改在 PCM 上套用；
+            None 時沿用每次以隨機語速重新合成。
+        sink (callable): 未指定 output_path 時，每句處理完成後交給此函式輸出（默認直接播放）。
+        normalizer: 整段語音共用的響度處理，需有 process(audio) 方法（默認 LoudnessNormalizer()）。
+        return_audio (bool): 是否組合並返回整段語音；只串流給 sink 時設為 False，
+            不必保留整段音訊（指定 output_path 時一律組合）。
+        check (bool): 是否先檢查 ffmpeg；不播放也不輸出壓縮檔的呼叫端（如假引擎負載測試）可設為 False。
+
+    返回：
+        AudioSegment: 整段語音（含停頓）；失敗或 return_audio=False 時返回 None。
+    """
+    # 檢查 ffmpeg
+    if check:
+        try:
+            check_ffmpeg()
+        except EnvironmentError as e:
+            print(e)
+            return None
+
+    if synthesize is None:
+        synthesize = partial(synthesize_sentence, init_engine())
+    sentences = split_sentences(text)
+
+    # 整段語音共用同一個響度統計
+    if normalizer is None:
+        normalizer = LoudnessNormalizer()
+    keep = return_audio or output_path is not None
+    segments = []
+    for i, sentence in enumerate(sentences):
+        speed, gain = sentence_prosody(sentence, i == 0, i == len(sentences) - 1)
+
+        try:
+            if take_cache is None:
+                raw = synthesize_with_retry(synthesize, sentence, int(base_rate * speed), base_volume)
+                audio = process_sentence(raw, normalizer, gain, effects)
+            else:
+                key = (sentence, base_rate, base_volume)
+                take = take_cache.get(key)
+                if take is None:
+                    raw = synthesize_with_retry(synthesize, sentence, base_rate, base_volume)
+                    try:
+                        take = prepare_take(raw, effects, strict=True)
+                    except Exception as e:
+                        # 這次使用未處理的音訊，但不放進快取，下次再重新處理
+                        print(f"音訊處理失敗，不快取: {e}")
+                        take = trim_silence(raw)
+                    else:
+                        take_cache.put(key, take)
+                audio = finish_take(take, normalizer, gain, speed)
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+            continue
+
+        # 句子間停頓（0.5-0.8 秒），最後一句後不加
+        if i < len(sentences) - 1:
+            audio += make_pause(audio, random.uniform(*PAUSE_RANGE_MS))
+
+        if output_path is None:
+            sink(audio)
+        if keep:
+            segments.append(audio)
+
+    if not segments:
+        return None
+    # 最後一次組合，避免逐句相加時反覆複製已累積的音訊
+    segments = AudioSegment._sync(*segments)
+    rendered = segments[0]._spawn(b''.join(segment.raw_data for segment in segments))
+    if output_path is not None:
+        rendered.export(output_path, format="wav")
+    return rendered
+
+if __name__ == "__main__":
+    # 測試語音
+    test_text = "你好，我是小智，我會講台灣狗已！"
+    natural_tts(test_text)
+
+    # 測試單獨「你好」
+    natural_tts("你好")
+
+    # 只合成一次，重複播放時的語氣變化在 PCM 上完成
+    takes = TakeCache()
+    for _ in range(3):
+        natural_tts(test_text, take_cache=takes)
+    print(f"快取命中 {takes.hits} 次，引擎合成 {takes.misses} 次")